@@ -69,6 +69,11 @@ async def start() -> None:
     thread_id: str = cl.user_session.get("id")
     cl.user_session.set("thread_id", thread_id)
     await static_messages(config, TriggerEvent.on_chat_start)
+    try:
+        await llm_graph.warmup()
+    except Exception:
+        # Best-effort: the first message retries initialization
+        logging.warning("Graph warm-up failed:", exc_info=True)
 
 
 @cl.on_chat_resume
@@ -0,0 +1,111 @@
+import hashlib
+from array import array
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Generic, TypeVar
+
+from langchain_core.callbacks import (AsyncCallbackManagerForRetrieverRun,
+                                      CallbackManagerForRetrieverRun)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.cache: OrderedDict[K, V] = OrderedDict()
+        self.lock = Lock()  # sync retrievers run in executor threads
+
+    def get(self, key: K) -> V | None:
+        with self.lock:
+            value: V | None = self.cache.get(key)
+            if value is not None:
+                self.cache.move_to_end(key)
+            return value
+
+    def set(self, key: K, value: V) -> None:
+        with self.lock:
+            self.cache[key] = value
+            self.cache.move_to_end(key)
+            if len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    # Hits mostly come from the per-table self-query retrievers within one turn,
+    # so a small cache suffices. Vectors are packed as doubles (~12 KB at 1536
+    # dims vs ~49 KB as a list of floats) to keep it cheap in each process.
+    def __init__(self, embeddings: Embeddings, maxsize: int = 1024) -> None:
+        self.embeddings = embeddings
+        self.cache: LRUCache[bytes, array[float]] = LRUCache(maxsize)
+
+    @staticmethod
+    def cache_key(text: str) -> bytes:
+        # Case is kept: embeddings (and gene symbols) are case-sensitive
+        return hashlib.sha256(text.strip().encode()).digest()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        key: bytes = self.cache_key(text)
+        vector: array[float] | None = self.cache.get(key)
+        if vector is None:
+            vector = array("d", self.embeddings.embed_query(text))
+            self.cache.set(key, vector)
+        return vector.tolist()
+
+    async def aembed_query(self, text: str) -> list[float]:
+        key: bytes = self.cache_key(text)
+        vector: array[float] | None = self.cache.get(key)
+        if vector is None:
+            vector = array("d", await self.embeddings.aembed_query(text))
+            self.cache.set(key, vector)
+        return vector.tolist()
+
+
+class CachedRetriever(BaseRetriever):
+    retriever: BaseRetriever
+    maxsize: int = 128  # each entry holds up to ~80 merged Documents
+
+    _cache: LRUCache[str, list[Document]] = PrivateAttr()
+
+    def model_post_init(self, __context: Any) -> None:
+        self._cache = LRUCache(self.maxsize)
+
+    @staticmethod
+    def cache_key(query: str) -> str:
+        # Collapse whitespace only; BM25 and embedding search are case-sensitive
+        return " ".join(query.split())
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        key: str = self.cache_key(query)
+        documents: list[Document] | None = self._cache.get(key)
+        if documents is None:
+            documents = self.retriever.invoke(
+                query, config={"callbacks": run_manager.get_child()}
+            )
+            self._cache.set(key, documents)
+        return list(documents)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        key: str = self.cache_key(query)
+        documents: list[Document] | None = self._cache.get(key)
+        if documents is None:
+            documents = await self.retriever.ainvoke(
+                query, config={"callbacks": run_manager.get_child()}
+            )
+            self._cache.set(key, documents)
+        return list(documents)
@@ -1,15 +1,22 @@
+from operator import attrgetter
+
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chains.retrieval import create_retrieval_chain
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.output_parsers import StrOutputParser
 from langchain_core.retrievers import BaseRetriever
-from langchain_core.runnables import Runnable
+from langchain_core.runnables import Runnable, RunnableLambda
 
 from system_prompt.reactome_prompt import contextualize_q_prompt, qa_prompt
 
+# Stateless output step shared by single-string chains
+message_content: Runnable = RunnableLambda(attrgetter("content"))
+
+# Tags the LLM call that produces the user-facing answer, for token streaming
+ANSWER_TAG = "answer"
+
 
 def create_rephrase_chain(llm: BaseChatModel) -> Runnable:
-    return (contextualize_q_prompt | llm | StrOutputParser()).with_config(
+    return (contextualize_q_prompt | llm | message_content).with_config(
         run_name="rephrase_question"
     )
 
@@ -17,7 +24,7 @@ def create_rephrase_chain(llm: BaseChatModel) -> Runnable:
 def create_rag_chain(llm: BaseChatModel, retriever: BaseRetriever) -> Runnable:
     # Create the documents chain
     question_answer_chain: Runnable = create_stuff_documents_chain(
-        llm=llm.model_copy(update={"streaming": True}),
+        llm=llm.model_copy(update={"streaming": True}).with_config(tags=[ANSWER_TAG]),
         prompt=qa_prompt,
     )
 
@@ -1,6 +1,8 @@
 import asyncio
 import os
-from typing import Annotated, Any, TypedDict
+import re
+from collections.abc import AsyncIterator
+from typing import Annotated, Any, Self, TypedDict
 
 from langchain_core.callbacks.base import Callbacks
 from langchain_core.documents import Document
@@ -16,7 +18,8 @@ from langgraph.graph.state import CompiledStateGraph, StateGraph
 from psycopg import AsyncConnection
 from psycopg_pool import AsyncConnectionPool
 
-from conversational_chain.chain import create_rag_chain, create_rephrase_chain
+from conversational_chain.chain import (ANSWER_TAG, create_rag_chain,
+                                        create_rephrase_chain)
 from external_search.state import WebSearchResult
 from external_search.workflow import create_search_workflow
 from util.logging import logging
@@ -28,6 +31,31 @@ connection_kwargs = {
     "prepare_threshold": 0,
 }
 
+# Both chainlit services share one Postgres, so size each pool per deployment
+POOL_MAX_SIZE = int(os.getenv("LG_POOL_MAX") or 20)
+POOL_MIN_SIZE = min(int(os.getenv("LG_POOL_MIN") or 5), POOL_MAX_SIZE)
+POOL_MAX_IDLE = float(os.getenv("LG_POOL_MAX_IDLE") or 300)
+POOL_MAX_LIFETIME = float(os.getenv("LG_POOL_MAX_LIFETIME") or 3600)
+POOL_TIMEOUT = float(os.getenv("LG_POOL_TIMEOUT") or 30)
+
+# Words that refer back to earlier turns and need the rephrase step to resolve
+anaphora_pattern = re.compile(
+    r"\b(it|its|this|that|these|those|they|them|their|above|previous)\b",
+    re.IGNORECASE,
+)
+# Minimum length of a first-turn question that is sent to retrieval as-is
+STANDALONE_MIN_WORDS = 12
+# English function words that are not also common words in other Latin-script languages
+english_stopwords = frozenset(
+    "the of and is are was were what how which does why when where with between "
+    "from into during for to by can be".split()
+)
+# Share of words that must be English stopwords before skipping translation
+ENGLISH_MIN_STOPWORD_RATIO = 0.15
+# Most recent chat history sent along with each turn, in messages and approximate tokens
+MAX_HISTORY_MESSAGES = 20
+MAX_HISTORY_TOKENS = 2048
+
 if not os.getenv("POSTGRES_LANGGRAPH_DB"):
     logging.warning("POSTGRES_LANGGRAPH_DB undefined; falling back to MemorySaver.")
 
@@ -40,6 +68,7 @@ class ChatState(TypedDict):
     user_input: str  # User input text
     rephrased_input: str  # LLM-generated query from user input
     chat_history: Annotated[list[BaseMessage], add_messages]
+    history_start: int  # index of the oldest chat_history message sent to the LLM
     context: list[Document]
     answer: str  # primary LLM response that is streamed to the user
     additional_content: (
@@ -71,10 +100,30 @@ class RAGGraphWithMemory:
         # The following are set asynchronously by calling initialize()
         self.graph: CompiledStateGraph | None = None
         self.pool: AsyncConnectionPool[AsyncConnection[dict[str, Any]]] | None = None
+        self.init_lock = asyncio.Lock()
 
-    def __del__(self) -> None:
-        if self.pool:
-            asyncio.run(self.close_pool())
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.close_pool()
+        self.pool = None
+        self.graph = None  # re-initialized on next use
+
+    async def get_graph(self) -> CompiledStateGraph:
+        # Double-checked so concurrent first requests open only one pool
+        if self.graph is None:
+            async with self.init_lock:
+                if self.graph is None:
+                    self.graph = await self.initialize()
+        return self.graph
+
+    async def warmup(self) -> None:
+        # Open the checkpointer pool and compile ahead of the first user message
+        await self.get_graph()
 
     async def initialize(self) -> CompiledStateGraph:
         checkpointer: BaseCheckpointSaver[str] = await self.create_checkpointer()
@@ -85,25 +134,118 @@ class RAGGraphWithMemory:
             return MemorySaver()
         self.pool = AsyncConnectionPool(
             conninfo=LANGGRAPH_DB_URI,
-            max_size=20,
+            min_size=POOL_MIN_SIZE,  # keep warm connections for the first requests
+            max_size=POOL_MAX_SIZE,
+            max_idle=POOL_MAX_IDLE,
+            max_lifetime=POOL_MAX_LIFETIME,
+            check=AsyncConnectionPool.check_connection,
             open=False,
-            timeout=30,
+            timeout=POOL_TIMEOUT,
             kwargs=connection_kwargs,
         )
-        await self.pool.open()
-        checkpointer = AsyncPostgresSaver(self.pool)
-        await checkpointer.setup()
+        try:
+            await self.pool.open()
+            checkpointer = AsyncPostgresSaver(self.pool)
+            await checkpointer.setup()
+        except Exception:
+            # Don't leak the pool when initialization is retried later
+            await self.close_pool()
+            self.pool = None
+            raise
         return checkpointer
 
     async def close_pool(self) -> None:
         if self.pool:
             await self.pool.close()
 
+    @staticmethod
+    def is_standalone_query(state: ChatState) -> bool:
+        # Rephrasing also translates to English. Unaccented Spanish or German is
+        # still ASCII, so English stopwords are required too. This is a heuristic:
+        # a non-English question that slips through is retrieved untranslated,
+        # while an English one that fails it only costs the usual rephrase call.
+        user_input: str = state["user_input"]
+        words: list[str] = re.findall(r"[a-z]+", user_input.lower())
+        return (
+            not state.get("chat_history")
+            and user_input.isascii()
+            and len(words) >= STANDALONE_MIN_WORDS
+            and sum(word in english_stopwords for word in words)
+            >= ENGLISH_MIN_STOPWORD_RATIO * len(words)
+            and anaphora_pattern.search(user_input) is None
+        )
+
+    @staticmethod
+    def approximate_tokens(message: BaseMessage) -> int:
+        # ~4 characters per token plus a few for the role; avoids model tokenizers
+        return len(str(message.content)) // 4 + 4
+
+    @classmethod
+    def history_window_start(cls, chat_history: list[BaseMessage]) -> int:
+        # Walk back from the newest message, counting each one once
+        start: int = len(chat_history)
+        oldest: int = max(len(chat_history) - MAX_HISTORY_MESSAGES, 0)
+        budget: int = MAX_HISTORY_TOKENS
+        for index in reversed(range(oldest, len(chat_history))):
+            budget -= cls.approximate_tokens(chat_history[index])
+            if budget < 0:
+                break
+            start = index
+        # Never open the window on an answer whose question was cut off
+        while start < len(chat_history) and not isinstance(
+            chat_history[start], HumanMessage
+        ):
+            start += 1
+        # Always keep the latest question and answer; history_window truncates them
+        if start == len(chat_history):
+            start = next(
+                (
+                    index
+                    for index in reversed(range(len(chat_history)))
+                    if isinstance(chat_history[index], HumanMessage)
+                ),
+                start,
+            )
+        return start
+
+    @classmethod
+    def history_window(
+        cls, chat_history: list[BaseMessage], start: int
+    ) -> list[BaseMessage]:
+        window: list[BaseMessage] = chat_history[start:]
+        budget: int = MAX_HISTORY_TOKENS
+        if sum(map(cls.approximate_tokens, window)) <= budget:
+            return window
+        # Only the latest pair can overflow: give each message an even share of
+        # what is left, so a short question leaves the rest to a long answer
+        trimmed: list[BaseMessage] = []
+        for position, message in enumerate(window):
+            share: int = budget // (len(window) - position)
+            tokens: int = cls.approximate_tokens(message)
+            if tokens > share:
+                content: str = str(message.content)[: max(share - 4, 0) * 4]
+                message = message.model_copy(update={"content": content})
+                tokens = share
+            budget -= tokens
+            trimmed.append(message)
+        return trimmed
+
     async def preprocess(
         self, state: ChatState, config: RunnableConfig
-    ) -> dict[str, str]:
-        query: str = await self.rephrase_chain.ainvoke(state, config)
-        return {"rephrased_input": query}
+    ) -> dict[str, Any]:
+        if self.is_standalone_query(state):
+            return {"rephrased_input": state["user_input"], "history_start": 0}
+        history_start: int = self.history_window_start(state["chat_history"])
+        query: str = await self.rephrase_chain.ainvoke(
+            {
+                "user_input": state["user_input"],
+                "chat_history": self.history_window(
+                    state["chat_history"], history_start
+                ),
+            },
+            config,
+        )
+        return {"rephrased_input": query, "history_start": history_start}
 
     async def call_model(
         self, state: ChatState, config: RunnableConfig
@@ -112,7 +254,9 @@ class RAGGraphWithMemory:
             {
                 "input": state["rephrased_input"],
                 "user_input": state["user_input"],
-                "chat_history": state["chat_history"],
+                "chat_history": self.history_window(
+                    state["chat_history"], state["history_start"]
+                ),
             },
             config,
         )
@@ -147,9 +291,8 @@ class RAGGraphWithMemory:
         thread_id: str,
         enable_postprocess: bool = True,
     ) -> dict[str, Any]:
-        if self.graph is None:
-            self.graph = await self.initialize()
-        result: dict[str, Any] = await self.graph.ainvoke(
+        graph: CompiledStateGraph = await self.get_graph()
+        result: dict[str, Any] = await graph.ainvoke(
             {"user_input": user_input},
             config=RunnableConfig(
                 callbacks=callbacks,
@@ -160,3 +303,36 @@ class RAGGraphWithMemory:
             ),
         )
         return result
+
+    async def aget_state_values(self, thread_id: str) -> dict[str, Any]:
+        graph: CompiledStateGraph = await self.get_graph()
+        snapshot = await graph.aget_state(
+            RunnableConfig(configurable={"thread_id": thread_id})
+        )
+        return snapshot.values
+
+    async def astream(
+        self,
+        user_input: str,
+        *,
+        callbacks: Callbacks,
+        thread_id: str,
+        enable_postprocess: bool = True,
+    ) -> AsyncIterator[str]:
+        graph: CompiledStateGraph = await self.get_graph()
+        async for event in graph.astream_events(
+            {"user_input": user_input},
+            config=RunnableConfig(
+                callbacks=callbacks,
+                configurable={
+                    "thread_id": thread_id,
+                    "enable_postprocess": enable_postprocess,
+                },
+            ),
+            version="v2",
+        ):
+            # Only forward answer tokens; retrieval, rephrase and search LLMs stream too
+            if event["event"] == "on_chat_model_stream" and ANSWER_TAG in event["tags"]:
+                content = event["data"]["chunk"].content
+                if isinstance(content, str) and content:
+                    yield content
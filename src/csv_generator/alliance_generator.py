@@ -1,45 +1,71 @@
 import gzip
+import json
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 import requests
 
+from util.logging import logging
+
 
 def download_file(url: str, dest: str, force: bool) -> Optional[str]:
     # Create the directory if it doesn't exist
     os.makedirs(os.path.dirname(dest), exist_ok=True)
 
-    # Check if the file exists and force is not set
-    if os.path.exists(dest) and not force:
-        print(f"File {dest} already exists. Skipping download.")
-        return dest
-
-    # Send the GET request
-    response = requests.get(url)
+    # Gzipped files are decompressed while downloading; only the result is kept
+    gzipped = dest.endswith(".gz")
+    final_dest = dest[:-3] if gzipped else dest
 
-    # Check if the request was successful
-    if response.status_code == 200:
-        # Save the response content to a file
-        with open(dest, "wb") as file:
-            file.write(response.content)
-        print(f"File downloaded successfully and saved to {dest}.")
-
-        # Check if the file is gzipped and decompress if necessary
-        if dest.endswith(".gz"):
-            unzipped_dest = dest[:-3]  # Remove '.gz' from the filename
-            with gzip.open(dest, "rb") as f_in:
-                with open(unzipped_dest, "wb") as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-            print(f"File unzipped successfully and saved to {unzipped_dest}.")
-            os.remove(dest)  # Remove the gzipped file after extraction
-            return unzipped_dest
-        return dest
-    else:
-        print(
-            f"Failed to download the file from {url}. Status code: {response.status_code}"
-        )
-        return None
+    # Check if the file exists and force is not set
+    if os.path.exists(final_dest) and not force:
+        logging.info(f"File {final_dest} already exists. Skipping download.")
+        return final_dest
+
+    # Revalidate against the validators saved from the last download
+    meta_dest = f"{final_dest}.meta.json"
+    headers: dict[str, str] = {}
+    if os.path.exists(final_dest) and os.path.exists(meta_dest):
+        with open(meta_dest) as meta_file:
+            meta: dict[str, Optional[str]] = json.load(meta_file)
+        if etag := meta.get("etag"):
+            headers["If-None-Match"] = etag
+        if last_modified := meta.get("last_modified"):
+            headers["If-Modified-Since"] = last_modified
+
+    # Send the GET request without buffering the body in memory
+    with requests.get(url, headers=headers, stream=True) as response:
+        if response.status_code == 304:
+            logging.info(f"File {final_dest} is unchanged upstream. Skipping download.")
+            return final_dest
+        if response.status_code != 200:
+            logging.warning(
+                f"Failed to download the file from {url}. Status code: {response.status_code}"
+            )
+            return None
+
+        response.raw.decode_content = True
+        partial_dest = f"{final_dest}.part"
+        with open(partial_dest, "wb") as f_out:
+            if gzipped:
+                with gzip.GzipFile(fileobj=response.raw) as f_in:
+                    shutil.copyfileobj(f_in, f_out, length=1 << 20)
+            else:
+                shutil.copyfileobj(response.raw, f_out, length=1 << 20)
+        os.replace(partial_dest, final_dest)
+
+        with open(meta_dest, "w") as meta_file:
+            json.dump(
+                {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                },
+                meta_file,
+            )
+
+    logging.info(f"File downloaded successfully and saved to {final_dest}.")
+    return final_dest
 
 
 def get_genes(version: str, force: bool) -> str:
@@ -50,7 +76,7 @@ def get_genes(version: str, force: bool) -> str:
 
     # Check if the file already exists and if regeneration is forced
     if not force and os.path.exists(gene_csv):
-        print(f"File {gene_csv} already exists. Skipping download.")
+        logging.info(f"File {gene_csv} already exists. Skipping download.")
         return gene_csv
 
     # Define the URL for the POST request
@@ -102,19 +128,27 @@ def get_genes(version: str, force: bool) -> str:
         # Save the response content to a file
         with open(gene_csv, "wb") as file:
             file.write(response.content)
-        print("File downloaded successfully.")
+        logging.info("File downloaded successfully.")
     else:
-        print("Failed to download the file. Status code:", response.status_code)
+        logging.warning(
+            f"Failed to download the file. Status code: {response.status_code}"
+        )
 
     return gene_csv
 
 
-def generate_all_csvs(version: str, force: bool) -> tuple:
-    files = []
+def fetch_file(version: str, name: str, url: str, force: bool) -> Optional[str]:
+    gz_dest = f"csv_files/alliance/{version}/{name}.tsv.gz"
+    csv_dest = f"csv_files/alliance/{version}/{name}.tsv"
+
+    if not os.path.exists(csv_dest) or force:
+        return download_file(url, gz_dest, force)
+    logging.info(f"File {csv_dest} already exists. Skipping download.")
+    return csv_dest
 
-    # Download gene file
-    gene_csv = get_genes(version, force)
-    files.append(gene_csv)
+
+def generate_all_csvs(version: str, force: bool, max_workers: int = 6) -> tuple:
+    files = []
 
     # Define other files to download
     other_files = {
@@ -131,16 +165,19 @@ def generate_all_csvs(version: str, force: bool) -> tuple:
         "variants_yeast": "https://fms.alliancegenome.org/download/VARIANT-ALLELE_NCBITaxon559292.tsv.gz",
     }
 
-    for name, url in other_files.items():
-        gz_dest = f"csv_files/alliance/{version}/{name}.tsv.gz"
-        csv_dest = f"csv_files/alliance/{version}/{name}.tsv"
-
-        if not os.path.exists(csv_dest) or force:
-            unzipped_dest = download_file(url, gz_dest, force)
+    # Downloads are network-bound, so fetch them in parallel threads
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        gene_future = executor.submit(get_genes, version, force)
+        other_futures = [
+            executor.submit(fetch_file, version, name, url, force)
+            for name, url in other_files.items()
+        ]
+
+        # Collect in submission order so the returned tuple stays stable
+        files.append(gene_future.result())
+        for future in other_futures:
+            unzipped_dest = future.result()
             if unzipped_dest:
                 files.append(unzipped_dest)
-        else:
-            print(f"File {csv_dest} already exists. Skipping download.")
-            files.append(csv_dest)
 
     return tuple(files)
@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Callable
 
@@ -39,8 +40,13 @@ def generate_all_csvs(
     csv_dir = Path(parent_dir) / "csv_files"
     csv_dir.mkdir(parents=True, exist_ok=True)
 
-    csv_paths = []
-    for file_name, data_fetch_func in CSV_GENERATION_MAP.items():
-        csv_path = generate_csv(connector, data_fetch_func, file_name, csv_dir, force)
-        csv_paths.append(csv_path)
+    # The neo4j driver is thread-safe and each query opens its own session
+    with ThreadPoolExecutor(max_workers=len(CSV_GENERATION_MAP)) as executor:
+        futures = [
+            executor.submit(
+                generate_csv, connector, data_fetch_func, file_name, csv_dir, force
+            )
+            for file_name, data_fetch_func in CSV_GENERATION_MAP.items()
+        ]
+        csv_paths = [future.result() for future in futures]
     return tuple(csv_paths)
@@ -21,6 +21,7 @@ from langchain_openai.chat_models.base import BaseChatOpenAI, ChatOpenAI
 from langchain_openai.embeddings import OpenAIEmbeddings
 from pydantic import SecretStr
 
+from conversational_chain.cache import CachedQueryEmbeddings, CachedRetriever
 from conversational_chain.graph import RAGGraphWithMemory
 from reactome.metadata_info import descriptions_info, field_info
 
@@ -98,6 +99,8 @@ def create_retrieval_chain(
 
     # Get OpenAIEmbeddings (or HuggingFaceEmbeddings model if specified)
     embedding_callable = get_embedding(hf_model, device)
+    # Share one embedding model and query-vector cache across all vectorstores
+    embedding = CachedQueryEmbeddings(embedding_callable())
 
     # Adjusted type for retriever_list
     retriever_list: list[BaseRetriever] = []
@@ -111,7 +114,6 @@ def create_retrieval_chain(
         bm25_retriever.k = 10
 
         # set up vectorstore SelfQuery retriever
-        embedding = embedding_callable()
         vectordb = Chroma(
             persist_directory=str(embeddings_directory / subdirectory),
             embedding_function=embedding,
@@ -130,7 +132,10 @@ def create_retrieval_chain(
         )
         retriever_list.append(rrf_retriever)
 
-    reactome_retriever = MergerRetriever(retrievers=retriever_list)
+    # Repeated queries skip the self-query LLM calls and vector searches
+    reactome_retriever = CachedRetriever(
+        retriever=MergerRetriever(retrievers=retriever_list)
+    )
 
     qa = RAGGraphWithMemory(
         retriever=reactome_retriever,
@@ -1,5 +1,7 @@
+import atexit
 import logging
 import logging.config
+import logging.handlers
 import os
 
 DEFAULT_LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -16,10 +18,21 @@ LOGGING_CONFIG = {
             "formatter": "default",
             "level": DEFAULT_LOG_LEVEL,  # Change to WARNING, ERROR, or CRITICAL
         },
+        # Hands records to a background thread so event-loop code never blocks on I/O
+        "queue": {
+            "class": "logging.handlers.QueueHandler",
+            "handlers": ["console"],
+            "respect_handler_level": True,
+        },
     },
     "root": {
-        "handlers": ["console"],
+        "handlers": ["queue"],
         "level": DEFAULT_LOG_LEVEL,  # Set the default log level for all loggers
     },
 }
 logging.config.dictConfig(LOGGING_CONFIG)
+
+queue_handler = logging.getHandlerByName("queue")
+if isinstance(queue_handler, logging.handlers.QueueHandler) and queue_handler.listener:
+    queue_handler.listener.start()
+    atexit.register(queue_handler.listener.stop)